@@ -1,38 +1,128 @@
 from fastapi import APIRouter, HTTPException, Query
-from app.ml.models import predict_system_status
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.core.prediction_log import PredictionLog
+from app.ml.drift import DriftMonitor
+from app.ml.models import (
+    get_models,
+    global_models,
+    load_species_models,
+    predict_system_status,
+    row_feature_columns,
+    row_feature_medians,
+    sensor_target_columns,
+    species_dir,
+    species_models,
+    uses_global_threshold,
+)
+from app.ml.warmup import get_readiness, warm_model_set
 from app.schemas.system_status import SystemStatusInput, SystemStatusResponse
+from datetime import datetime
 from typing import Optional
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # Store the latest input and prediction data
 latest_input_data = None
 latest_prediction_result = None
 current_anomaly_threshold = 0.08  # Set default threshold to 0.09
 
+drift_monitor = DriftMonitor(
+    row_feature_medians,
+    half_life=settings.DRIFT_HALF_LIFE,
+    threshold=settings.DRIFT_THRESHOLD,
+    min_samples=settings.DRIFT_MIN_SAMPLES,
+    max_types=settings.DRIFT_MAX_TYPES,
+)
+for _algae_type, _models in species_models.items():
+    if _models.own_row_model:
+        drift_monitor.set_training_medians(_algae_type, _models.row_feature_medians)
+
+prediction_log = PredictionLog(
+    settings.PREDICTION_LOG_DIR,
+    [col for col in row_feature_columns if not col.startswith("algae_type_")],
+    sensor_target_columns,
+    flush_interval=settings.PREDICTION_LOG_FLUSH_INTERVAL,
+) if settings.PREDICTION_LOG_ENABLED else None
+
+
+def restore_state():
+    """Rebuild in-memory state from the tail of the prediction log after a restart"""
+    global latest_input_data, latest_prediction_result, current_anomaly_threshold
+    if prediction_log is None:
+        return
+
+    last = None
+    global_threshold = None
+    for rec in prediction_log.tail(settings.PREDICTION_LOG_RESTORE_RECORDS):
+        # A bad record must not keep the service from starting
+        try:
+            record = prediction_log.to_dict(rec)
+            input_data = SystemStatusInput(**record["input_data"], device_id=record["device_id"])
+        except Exception:
+            logger.exception("Skipping unreadable prediction log record")
+            continue
+        drift_monitor.update(record["input_data"])
+        last = (record, input_data)
+        # Species with a calibrated threshold log their own, not the global one
+        if uses_global_threshold(get_models(record["input_data"]["algae_type"])):
+            global_threshold = record["anomaly_threshold"]
+    if last is None:
+        return
+
+    record, latest_input_data = last
+    # Explanations are not logged, so the restored result carries none
+    latest_prediction_result = SystemStatusResponse(
+        sensor_faults=record["sensor_faults"],
+        sensor_explanations={},
+        row_anomaly=record["row_anomaly"],
+        row_score=record["row_score"],
+        row_top_features={},
+        anomaly_threshold=record["anomaly_threshold"]
+    )
+    if global_threshold is not None:
+        current_anomaly_threshold = global_threshold
+
+
 @router.post("/predict", response_model=SystemStatusResponse)
 async def predict(
     input_data: SystemStatusInput,
     anomaly_threshold: Optional[float] = Query(None, description="Custom threshold for anomaly detection")
 ):
     global latest_input_data, latest_prediction_result, current_anomaly_threshold
-    
+
+    # Species row models score on their own scale; a global threshold cannot apply
+    if anomaly_threshold is not None and not uses_global_threshold(get_models(input_data.algae_type)):
+        raise HTTPException(
+            status_code=400,
+            detail=f"anomaly_threshold cannot be set on a request for '{input_data.algae_type}', "
+                   "which uses its own row anomaly model"
+        )
+
     try:
         # Update current threshold if provided
         if anomaly_threshold is not None:
             current_anomaly_threshold = anomaly_threshold
             
+        input_json = input_data.dict()
+        device_id = input_json.pop("device_id", None)
         results = predict_system_status(
-            input_data.dict(),
+            input_json,
             anomaly_threshold=current_anomaly_threshold
         )
+        drift_monitor.update(input_json)
+        if prediction_log is not None:
+            prediction_log.append(input_json, results, results["anomaly_threshold"], device_id)
         
         response = SystemStatusResponse(
             sensor_faults=results["sensor_faults"],
             sensor_explanations=results["sensor_explanations"],
             row_anomaly=bool(results["row_anomaly"]),
             row_score=results["row_score"],
-            row_top_features=results["row_top_features"]
+            row_top_features=results["row_top_features"],
+            anomaly_threshold=results["anomaly_threshold"]
         )
         
         # Store the latest data
@@ -46,9 +136,23 @@ async def predict(
 
 @router.get("/health")
 async def health_check():
+    """Liveness probe: the process is up and warm-up has not given up"""
+    state = get_readiness()
+    if not state["live"]:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unhealthy", "reason": state["status"], "error": state["error"]}
+        )
     return {"status": "healthy"}
 
 
+@router.get("/ready")
+async def readiness_check():
+    """Readiness probe: models are warmed up and within the latency budget"""
+    state = get_readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+
 @router.get("/latest-prediction")
 async def get_latest_prediction():
     """Get the latest input data and prediction result received by the API"""
@@ -71,4 +175,70 @@ async def set_threshold(threshold: float = Query(..., description="New threshold
     """Set a new anomaly detection threshold"""
     global current_anomaly_threshold
     current_anomaly_threshold = threshold
-    return {"threshold": current_anomaly_threshold} 
\ No newline at end of file
+    return {"threshold": current_anomaly_threshold} 
+
+@router.get("/drift")
+async def get_drift():
+    """Get per-algae_type feature drift scores against the training medians"""
+    return {
+        "threshold": drift_monitor.threshold,
+        "min_samples": drift_monitor.min_samples,
+        "algae_types": drift_monitor.report()
+    }
+
+
+@router.get("/predictions")
+def get_predictions(
+    start: Optional[datetime] = Query(None, description="Inclusive start of the time range"),
+    end: Optional[datetime] = Query(None, description="Exclusive end of the time range"),
+    device_id: Optional[str] = Query(None, description="Only return predictions from this device"),
+    limit: int = Query(1000, ge=1, le=10000, description="Maximum number of most recent records to return")
+):
+    """
+    Get logged predictions from the durable prediction log
+
+    Plain def so FastAPI runs the read and decode in its threadpool instead
+    of blocking the event loop.
+    """
+    if prediction_log is None:
+        raise HTTPException(status_code=404, detail="Prediction log is disabled")
+
+    parts = prediction_log.query(start=start, end=end, device_id=device_id)
+    records = []
+    remaining = limit
+    for part in reversed(parts):
+        if remaining <= 0:
+            break
+        chunk = part[-remaining:]
+        records[:0] = prediction_log.to_dicts(chunk)
+        remaining -= len(chunk)
+
+    return {"count": len(records), "predictions": records}
+
+
+@router.get("/models")
+async def get_model_sets():
+    """List the global model set and the per-algae_type species model sets"""
+    return {
+        "global": global_models.describe(),
+        "species": {name: models.describe() for name, models in sorted(species_models.items())}
+    }
+
+@router.post("/models/{algae_type}/reload")
+def reload_species_models(algae_type: str):
+    """Load or hot-swap the species models for one algae_type from disk"""
+    try:
+        species_dir(algae_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        # Warm the new set before it takes traffic
+        models = load_species_models(algae_type, before_swap=warm_model_set)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model reload error: {str(e)}")
+    drift_monitor.set_training_medians(
+        algae_type, models.row_feature_medians if models is not None and models.own_row_model else None
+    )
+    if models is None:
+        return {"algae_type": algae_type, "loaded": False, "routed_to": global_models.name}
+    return {"algae_type": algae_type, "loaded": True, "models": models.describe()}
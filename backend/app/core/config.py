@@ -14,6 +14,25 @@ class Settings(BaseSettings):
     ALLOWED_ORIGINS: List[str] = CORS_ORIGINS
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
     MODEL_PATH: str = os.path.join(os.getcwd(), "app/ml/models")
+    # Feature-drift monitoring against training medians
+    DRIFT_HALF_LIFE: int = 500
+    DRIFT_THRESHOLD: float = 3.0
+    DRIFT_MIN_SAMPLES: int = 30
+    DRIFT_MAX_TYPES: int = 32
+    # Startup warm-up and readiness gating
+    WARMUP_RUNS: int = 5
+    WARMUP_MAX_ROUNDS: int = 3
+    READINESS_LATENCY_BUDGET_MS: float = 500.0
+    WARMUP_MAX_ATTEMPTS: int = 5
+    WARMUP_RETRY_BACKOFF_S: float = 5.0
+    WARMUP_RETRY_MAX_BACKOFF_S: float = 60.0
+    # Largest batch scored by the fused sensor evaluator before falling back
+    FUSED_SENSOR_MAX_BATCH: int = 128
+    # Durable prediction log
+    PREDICTION_LOG_ENABLED: bool = True
+    PREDICTION_LOG_DIR: str = os.path.join(os.getcwd(), "data/prediction_log")
+    PREDICTION_LOG_FLUSH_INTERVAL: float = 0.05
+    PREDICTION_LOG_RESTORE_RECORDS: int = 5000
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,360 @@
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.schemas.system_status import ALGAE_TYPE_MAX_BYTES, DEVICE_ID_MAX_BYTES
+
+# -------- Append-only prediction log --------
+# Records are fixed-width and written back to back into one segment file per
+# UTC day, so a segment can be memory-mapped directly as a structured array.
+# Each segment starts with a header naming its record schema; segments written
+# with a different schema are skipped and never modified.
+SEGMENT_PREFIX = "predictions-"
+SEGMENT_SUFFIX = ".bin"
+SEGMENT_MAGIC = b"ALGPLOG\x00"
+SEGMENT_VERSION = 1
+HEADER_ALIGN = 64
+DEVICE_ID_BYTES = DEVICE_ID_MAX_BYTES
+ALGAE_TYPE_BYTES = ALGAE_TYPE_MAX_BYTES
+MAX_RETRY_DELAY_S = 30.0
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+logger = logging.getLogger(__name__)
+
+
+def make_record_dtype(feature_columns, target_columns) -> np.dtype:
+    if len(target_columns) > 64:
+        raise ValueError("Fault bitmask supports at most 64 sensor targets")
+    return np.dtype([
+        ("timestamp_ns", "<i8"),
+        ("device_id", f"S{DEVICE_ID_BYTES}"),
+        ("algae_type", f"S{ALGAE_TYPE_BYTES}"),
+        ("features", "<f8", (len(feature_columns),)),
+        ("row_score", "<f8"),
+        ("anomaly_threshold", "<f8"),
+        ("fault_mask", "<u8"),
+        ("row_anomaly", "u1"),
+    ])
+
+
+def _to_ns(dt: datetime) -> int:
+    # Naive datetimes are taken as UTC; integer math avoids float rounding
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def _from_ns(timestamp_ns: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=timestamp_ns // 1000)
+
+
+def _encode_fixed(value: str, size: int) -> bytes:
+    """UTF-8 encodes `value`, truncating on a character boundary to fit `size` bytes."""
+    return value.encode()[:size].decode("utf-8", errors="ignore").encode()
+
+
+def _decode_fixed(value: bytes) -> str:
+    return value.decode("utf-8", errors="replace")
+
+
+def _segment_day(timestamp_ns: int) -> str:
+    return _from_ns(timestamp_ns).strftime("%Y%m%d")
+
+
+class PredictionLog:
+    """
+    Durable, append-only log of predictions segmented per UTC day.
+
+    `append` only enqueues; a background writer group-commits everything
+    pending in a single write + fsync. Reads memory-map the segments and
+    return zero-copy structured-array views where possible.
+
+    Segments written with a different record schema (e.g. before the feature
+    list changed) are skipped and left as they are; a day whose segment has
+    another schema continues in a new numbered segment.
+
+    Args:
+        log_dir: Directory holding the day segments
+        feature_columns: Input features stored per record, in order
+        target_columns: Sensor targets; bit i of fault_mask is target i
+        flush_interval: Seconds the writer waits to batch pending records
+    """
+
+    def __init__(self, log_dir: str, feature_columns, target_columns,
+                 flush_interval: float = 0.05):
+        self.log_dir = log_dir
+        self.feature_columns = list(feature_columns)
+        self.target_columns = list(target_columns)
+        self.dtype = make_record_dtype(self.feature_columns, self.target_columns)
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._writer = None
+        self._start_lock = threading.Lock()
+        self._last_ts = 0
+        self._header = self._make_header()
+        self._skipped = set()
+        self._write_paths = {}
+        os.makedirs(log_dir, exist_ok=True)
+        self._repair_segments()
+
+    # ---- segments ----
+    def _make_header(self) -> bytes:
+        """Magic, format version, header length and the JSON record schema, padded."""
+        schema = json.dumps({
+            "dtype": self.dtype.descr,
+            "feature_columns": self.feature_columns,
+            "target_columns": self.target_columns,
+        }).encode()
+        size = -(-(len(SEGMENT_MAGIC) + 8 + len(schema)) // HEADER_ALIGN) * HEADER_ALIGN
+        header = SEGMENT_MAGIC + struct.pack("<II", SEGMENT_VERSION, size) + schema
+        return header.ljust(size, b" ")
+
+    def _segment_path(self, day: str, seq: int = 0) -> str:
+        # A day gets further numbered segments when its first one has another schema
+        name = f"{day}-{seq}" if seq else day
+        return os.path.join(self.log_dir, f"{SEGMENT_PREFIX}{name}{SEGMENT_SUFFIX}")
+
+    def _segment_files(self):
+        """(day, seq, path) of every segment file in the directory, oldest first."""
+        files = []
+        for name in os.listdir(self.log_dir):
+            if not (name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)):
+                continue
+            day, _, seq = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)].partition("-")
+            if len(day) != 8 or not day.isdigit() or (seq and not seq.isdigit()):
+                continue
+            files.append((day, int(seq or 0), os.path.join(self.log_dir, name)))
+        return sorted(files)
+
+    def _matches_schema(self, path: str) -> bool:
+        with open(path, "rb") as f:
+            return f.read(len(self._header)) == self._header
+
+    def _segments(self):
+        """(day, path) of the segments written with this log's schema, oldest first."""
+        segments = []
+        for day, _, path in self._segment_files():
+            if self._matches_schema(path):
+                segments.append((day, path))
+            elif os.path.getsize(path) and path not in self._skipped:
+                self._skipped.add(path)
+                logger.warning("Skipping prediction log segment %s: written with a different record schema", path)
+        return segments
+
+    def segment_days(self):
+        return sorted({day for day, _ in self._segments()})
+
+    def _repair_segments(self):
+        """Drop a torn trailing record left by a crash mid-write."""
+        for _, path in self._segments():
+            size = os.path.getsize(path)
+            torn = (size - len(self._header)) % self.dtype.itemsize
+            if torn:
+                with open(path, "r+b") as f:
+                    f.truncate(size - torn)
+        last = self.tail(1)
+        if len(last):
+            self._last_ts = int(last["timestamp_ns"][-1])
+
+    def _open_segment(self, path: str) -> np.ndarray:
+        # Ignore a partial record still being appended by the writer
+        count = (os.path.getsize(path) - len(self._header)) // self.dtype.itemsize
+        if count <= 0:
+            return np.empty(0, dtype=self.dtype)
+        return np.memmap(path, dtype=self.dtype, mode="r", offset=len(self._header), shape=(count,))
+
+    def _writable_path(self, day: str) -> str:
+        """The day's last segment if it has this schema, else a new one after it."""
+        path = self._write_paths.get(day)
+        if path is None:
+            files = [(seq, p) for d, seq, p in self._segment_files() if d == day]
+            if not files:
+                path = self._segment_path(day)
+            else:
+                seq, path = files[-1]
+                if os.path.getsize(path) and not self._matches_schema(path):
+                    path = self._segment_path(day, seq + 1)
+            self._write_paths[day] = path
+        return path
+
+    # ---- writes ----
+    def append(self, input_json: dict, results: dict, anomaly_threshold=None, device_id=None):
+        """Enqueue a prediction for the writer; never blocks on disk."""
+        self._ensure_writer()
+        self._queue.put((time.time_ns(), input_json, results, anomaly_threshold, device_id))
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._start_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._run_writer, name="prediction-log-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _to_record(self, item, record):
+        timestamp_ns, input_json, results, anomaly_threshold, device_id = item
+        # Keep each segment sorted so range reads can binary search
+        timestamp_ns = max(timestamp_ns, self._last_ts)
+        self._last_ts = timestamp_ns
+        record["timestamp_ns"] = timestamp_ns
+        record["device_id"] = _encode_fixed(device_id or "", DEVICE_ID_BYTES)
+        record["algae_type"] = _encode_fixed(str(input_json.get("algae_type") or ""), ALGAE_TYPE_BYTES)
+        features = [input_json.get(feat) for feat in self.feature_columns]
+        record["features"] = [np.nan if v is None else float(v) for v in features]
+        record["row_score"] = results["row_score"]
+        record["anomaly_threshold"] = np.nan if anomaly_threshold is None else anomaly_threshold
+        faults = set(results["sensor_faults"])
+        mask = 0
+        for i, sensor in enumerate(self.target_columns):
+            if sensor in faults:
+                mask |= 1 << i
+        record["fault_mask"] = mask
+        record["row_anomaly"] = int(results["row_anomaly"])
+
+    def _run_writer(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            time.sleep(self.flush_interval)
+            batch = [item]
+            stop = False
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        records = np.zeros(len(batch), dtype=self.dtype)
+        keep = []
+        for i, item in enumerate(batch):
+            try:
+                self._to_record(item, records[i])
+                keep.append(i)
+            except Exception:
+                # A record that cannot be encoded would fail every retry
+                logger.exception("Dropping prediction that cannot be encoded for the log")
+        records = records[keep]
+        days = np.array([_segment_day(int(ts)) for ts in records["timestamp_ns"]])
+        for day in dict.fromkeys(days):
+            self._write_with_retry(day, records[days == day].tobytes())
+
+    def _write_with_retry(self, day: str, data: bytes):
+        """Keeps retrying a failed segment write with backoff rather than dropping it."""
+        delay = max(self.flush_interval, 0.1)
+        while True:
+            try:
+                self._write_segment(day, data)
+                return
+            except Exception:
+                logger.exception("Prediction log write to segment %s failed; retrying in %.1fs", day, delay)
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY_S)
+
+    def _write_segment(self, day: str, data: bytes):
+        with open(self._writable_path(day), "ab") as f:
+            offset = f.tell()
+            if offset == 0:
+                data = self._header + data
+            try:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            except Exception:
+                # Roll back a partial write so the retry stays record-aligned
+                try:
+                    f.truncate(offset)
+                except OSError:
+                    pass
+                raise
+
+    def flush(self, timeout: float = 5.0):
+        """Stop the writer after committing everything already enqueued."""
+        if self._writer is None or not self._writer.is_alive():
+            return
+        self._queue.put(None)
+        self._writer.join(timeout)
+
+    # ---- reads ----
+    def query(self, start: datetime = None, end: datetime = None, device_id: str = None):
+        """
+        Returns a list of per-segment record arrays with start <= timestamp < end.
+
+        Time-range results are zero-copy views of the memory-mapped segments;
+        filtering by device_id selects a copy.
+        """
+        start_ns = _to_ns(start) if start else None
+        end_ns = _to_ns(end) if end else None
+        start_day = _segment_day(start_ns) if start_ns is not None else None
+        end_day = _segment_day(end_ns) if end_ns is not None else None
+
+        parts = []
+        for day, path in self._segments():
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            records = self._open_segment(path)
+            ts = records["timestamp_ns"]
+            lo = np.searchsorted(ts, start_ns, side="left") if start_ns is not None else 0
+            hi = np.searchsorted(ts, end_ns, side="left") if end_ns is not None else len(records)
+            records = records[lo:hi]
+            if device_id is not None:
+                records = records[records["device_id"] == device_id.encode()]
+            if len(records):
+                parts.append(records)
+        return parts
+
+    def tail(self, n: int) -> np.ndarray:
+        """Returns the last n records across segments, oldest first."""
+        parts = []
+        remaining = n
+        for _, path in reversed(self._segments()):
+            if remaining <= 0:
+                break
+            records = self._open_segment(path)
+            parts.append(records[-remaining:] if remaining < len(records) else records)
+            remaining -= len(parts[-1])
+        if not parts:
+            return np.empty(0, dtype=self.dtype)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts[::-1])
+
+    def to_dict(self, rec) -> dict:
+        """Decodes one record back into the input/prediction shape used by the API."""
+        input_json = {"algae_type": _decode_fixed(rec["algae_type"])}
+        for feat, value in zip(self.feature_columns, rec["features"]):
+            input_json[feat] = None if np.isnan(value) else float(value)
+        mask = int(rec["fault_mask"])
+        threshold = float(rec["anomaly_threshold"])
+        return {
+            "timestamp": _from_ns(int(rec["timestamp_ns"])).isoformat(),
+            "device_id": _decode_fixed(rec["device_id"]) or None,
+            "input_data": input_json,
+            "sensor_faults": [
+                sensor for i, sensor in enumerate(self.target_columns) if mask >> i & 1
+            ],
+            "row_anomaly": bool(rec["row_anomaly"]),
+            "row_score": float(rec["row_score"]),
+            "anomaly_threshold": None if np.isnan(threshold) else threshold,
+        }
+
+    def to_dicts(self, records: np.ndarray) -> list:
+        """Decodes records back into the input/prediction shape used by the API."""
+        return [self.to_dict(rec) for rec in records]
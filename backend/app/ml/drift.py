@@ -0,0 +1,135 @@
+import math
+import threading
+
+# -------- Streaming feature-drift monitor --------
+class DriftMonitor:
+    """
+    Tracks exponentially weighted running moments per (algae_type, feature)
+    and compares them against the training medians.
+
+    Each reading costs O(1) per feature and memory is bounded by
+    max_types * n_features * 3 floats: once `max_types` algae types are
+    tracked, readings of any further type share one overflow bucket.
+
+    Args:
+        training_medians: Feature medians from training (row_feature_medians)
+        half_life: Number of readings after which an observation's weight halves
+        threshold: Drift score above which a feature is reported as drifted
+        min_samples: Readings required before a feature is scored
+        max_types: Number of distinct algae types tracked individually
+    """
+
+    OVERFLOW_TYPE = "__other__"
+
+    def __init__(self, training_medians: dict, half_life: int = 500,
+                 threshold: float = 3.0, min_samples: int = 30, max_types: int = 32):
+        # One-hot algae_type columns are not sensor readings
+        self.training_medians = {
+            feat: float(med) for feat, med in training_medians.items()
+            if not feat.startswith("algae_type_")
+        }
+        self.alpha = 1.0 - 0.5 ** (1.0 / half_life)
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.max_types = max_types
+        # algae_type -> medians, for species that ship their own
+        self._type_medians = {}
+        # algae_type -> feature -> [count, ew_mean, ew_var]
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def set_training_medians(self, algae_type: str, training_medians: dict = None):
+        """Compare `algae_type` against its own medians, or the global ones if None."""
+        with self._lock:
+            if training_medians is None:
+                self._type_medians.pop(algae_type, None)
+            else:
+                self._type_medians[algae_type] = {
+                    feat: float(med) for feat, med in training_medians.items()
+                    if not feat.startswith("algae_type_")
+                }
+
+    def medians_for(self, algae_type: str) -> dict:
+        return self._type_medians.get(algae_type, self.training_medians)
+
+    def update(self, input_json: dict):
+        """Fold a single reading into the sketch of its algae_type."""
+        algae_type = input_json.get("algae_type")
+        if algae_type is None:
+            return
+        with self._lock:
+            if algae_type not in self._stats and len(self._stats) >= self.max_types:
+                algae_type = self.OVERFLOW_TYPE
+            per_type = self._stats.setdefault(algae_type, {})
+            for feat in self.medians_for(algae_type):
+                value = input_json.get(feat)
+                if value is None or isinstance(value, bool):
+                    continue
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                if math.isnan(value):
+                    continue
+                stat = per_type.get(feat)
+                if stat is None:
+                    per_type[feat] = [1, value, 0.0]
+                    continue
+                # West's incremental weighted mean/variance. Until the window
+                # fills, 1/count weights give the plain cumulative moments so
+                # early scores aren't dominated by the first reading.
+                stat[0] += 1
+                alpha = max(self.alpha, 1.0 / stat[0])
+                diff = value - stat[1]
+                incr = alpha * diff
+                stat[1] += incr
+                stat[2] = (1.0 - alpha) * (stat[2] + diff * incr)
+
+    def _score(self, median, stat):
+        count, mean, var = stat
+        # Scale by the live spread, but never by less than a sliver of the
+        # median itself, so near-constant sensors don't blow up the score
+        scale = max(math.sqrt(var), 0.01 * abs(median), 1e-9)
+        return abs(mean - median) / scale
+
+    def report(self) -> dict:
+        """
+        Returns drift scores per algae_type and feature.
+
+        Features with fewer than `min_samples` readings are scored as None.
+        """
+        with self._lock:
+            snapshot = {
+                algae_type: {feat: list(stat) for feat, stat in per_type.items()}
+                for algae_type, per_type in self._stats.items()
+            }
+            medians = {algae_type: self.medians_for(algae_type) for algae_type in snapshot}
+
+        report = {}
+        for algae_type, per_type in snapshot.items():
+            features = {}
+            drifted = []
+            for feat, stat in per_type.items():
+                # Features the current medians no longer cover are not scored
+                median = medians[algae_type].get(feat)
+                if median is None:
+                    continue
+                score = self._score(median, stat) if stat[0] >= self.min_samples else None
+                features[feat] = {
+                    "count": stat[0],
+                    "mean": stat[1],
+                    "std": math.sqrt(stat[2]),
+                    "training_median": median,
+                    "drift_score": score,
+                }
+                if score is not None and score > self.threshold:
+                    drifted.append(feat)
+            report[algae_type] = {
+                "drifted_features": sorted(drifted, key=lambda f: -features[f]["drift_score"]),
+                "features": features,
+            }
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,141 @@
+import numpy as np
+
+# -------- Fused multi-output tree-ensemble evaluator --------
+class FusedForestEvaluator:
+    """
+    Flattens every tree of every per-target estimator of a multi-output
+    forest (e.g. MultiOutputClassifier(RandomForestClassifier)) into one node
+    table and evaluates the whole batch against all trees at once.
+
+    Predictions reproduce `model.predict` exactly: inputs are cast to float32
+    like sklearn's trees, NaNs follow each node's missing-value direction, and
+    per-tree probabilities are summed in the same order before averaging.
+
+    Use `compile_multi_output_forest` to build one; it returns None for models
+    that cannot be fused so callers can fall back to `model.predict`.
+    """
+
+    def __init__(self, estimators):
+        n_est = len(estimators)
+        trees = [self._trees_of(est) for est in estimators]
+        self.n_targets = n_est
+        self.max_trees = max(len(t) for t in trees)
+        self.n_classes = max(len(est.classes_) for est in estimators)
+        self.classes = [np.asarray(est.classes_) for est in estimators]
+        self.n_trees = np.array([len(t) for t in trees], dtype=np.float64)
+
+        # Node 0 is a shared zero-probability leaf used to pad estimators with
+        # fewer trees; adding 0.0 leaves the running sum bit-identical.
+        left, right, feature, threshold, missing_left = [[-1]], [[-1]], [[0]], [[0.0]], [[0]]
+        proba = [np.zeros((1, self.n_classes))]
+        roots = np.zeros((n_est, self.max_trees), dtype=np.intp)
+        offset = 1
+        for e, est_trees in enumerate(trees):
+            for t, tree in enumerate(est_trees):
+                state = tree.__getstate__()["nodes"]
+                n_nodes = len(state)
+                is_leaf = state["left_child"] == -1
+                left.append(np.where(is_leaf, -1, state["left_child"] + offset))
+                right.append(np.where(is_leaf, -1, state["right_child"] + offset))
+                feature.append(np.where(is_leaf, 0, state["feature"]))
+                threshold.append(state["threshold"])
+                if "missing_go_to_left" in state.dtype.names:
+                    missing_left.append(state["missing_go_to_left"])
+                else:
+                    missing_left.append(np.zeros(n_nodes, dtype=np.uint8))
+                # Same normalization as DecisionTreeClassifier.predict_proba
+                value = tree.value[:, 0, :tree.n_classes[0]].copy()
+                normalizer = value.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value /= normalizer
+                padded = np.zeros((n_nodes, self.n_classes))
+                padded[:, :value.shape[1]] = value
+                proba.append(padded)
+                roots[e, t] = offset
+                offset += n_nodes
+
+        self.left = np.concatenate(left).astype(np.intp)
+        self.right = np.concatenate(right).astype(np.intp)
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold).astype(np.float64)
+        self.missing_left = np.concatenate(missing_left).astype(bool)
+        self.is_leaf = self.left == -1
+        # children[node, go_left] picks the next node with a single gather
+        self.children = np.stack([self.right, self.left], axis=1)
+        self.proba = np.concatenate(proba)
+        self.roots = roots
+        self.max_depth = max(tree.max_depth for est_trees in trees for tree in est_trees)
+
+    @staticmethod
+    def _trees_of(est):
+        if hasattr(est, "tree_"):
+            return [est.tree_]
+        return [sub.tree_ for sub in est.estimators_]
+
+    def apply(self, X) -> np.ndarray:
+        """Returns the flat leaf index reached in every tree, shape (n, n_targets, max_trees)."""
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n, n_features = X.shape
+        per_row = self.roots.size
+        node = np.tile(self.roots.ravel(), n)
+        has_nan = np.isnan(X).any()
+        x_flat = X.ravel()
+        # Only (row, tree) pairs still above a leaf are gathered at each level,
+        # so the work follows actual path lengths rather than max_depth
+        active = np.flatnonzero(~self.is_leaf[node])
+        while active.size:
+            cur = node[active]
+            x = x_flat[(active // per_row) * n_features + self.feature[cur]]
+            go_left = x <= self.threshold[cur]
+            if has_nan:
+                go_left = np.where(np.isnan(x), self.missing_left[cur], go_left)
+            nxt = self.children[cur, go_left.view(np.uint8)]
+            node[active] = nxt
+            active = active[~self.is_leaf[nxt]]
+        return node.reshape((n,) + self.roots.shape)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Returns averaged class probabilities, shape (n, n_targets, n_classes)."""
+        leaves = self.apply(X)
+        acc = np.zeros(leaves.shape[:2] + (self.n_classes,))
+        for t in range(self.max_trees):
+            acc += self.proba[leaves[:, :, t]]
+        acc /= self.n_trees[None, :, None]
+        return acc
+
+    def predict(self, X) -> np.ndarray:
+        """Equivalent of `model.predict(X)`, shape (n, n_targets)."""
+        best = np.argmax(self.predict_proba(X), axis=2)
+        return np.column_stack([
+            self.classes[e].take(best[:, e]) for e in range(self.n_targets)
+        ])
+
+    def fault_mask(self, X, missing=None) -> np.ndarray:
+        """
+        Boolean fault flags per target, with `missing` (same shape) forcing
+        a fault where the sensor's own input was missing.
+        """
+        faults = self.predict(X) == 1
+        if missing is not None:
+            faults |= np.asarray(missing, dtype=bool)
+        return faults
+
+
+def compile_multi_output_forest(model):
+    """Builds a FusedForestEvaluator for `model`, or None if it cannot be fused."""
+    estimators = getattr(model, "estimators_", None)
+    if not estimators:
+        return None
+    for est in estimators:
+        if not hasattr(est, "classes_") or getattr(est, "n_outputs_", 1) != 1:
+            return None
+        try:
+            trees = FusedForestEvaluator._trees_of(est)
+        except AttributeError:
+            return None
+        if not trees or any(tree.n_outputs != 1 for tree in trees):
+            return None
+        # Only uniformly averaged forests reproduce predict exactly
+        if not hasattr(est, "tree_") and type(est).predict_proba.__qualname__ != "ForestClassifier.predict_proba":
+            return None
+    return FusedForestEvaluator(estimators)
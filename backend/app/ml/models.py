@@ -3,22 +3,175 @@ import numpy as np
 import joblib
 import shap
 import os
+import logging
+import threading
 from app.core.config import settings
+from app.ml.fused import compile_multi_output_forest
+
+logger = logging.getLogger(__name__)
 
 # Define model paths
 model_path = settings.MODEL_PATH
+# Optional per-algae_type sub-models live in species/<algae_type>/
+species_model_path = os.path.join(model_path, "species")
+
+SENSOR_FILES = {
+    "sensor_model": "sensor_fault_model_v2.pkl",
+    "sensor_feature_columns": "sensor_feature_columns_v2.pkl",
+    "sensor_target_columns": "sensor_target_columns_v2.pkl",
+}
+ROW_FILES = {
+    "row_model": "row_anomaly_model.pkl",
+    "row_scaler": "row_anomaly_scaler.pkl",
+    "row_feature_columns": "row_feature_columns.pkl",
+    "row_feature_medians": "row_feature_medians.pkl",
+}
+ROW_THRESHOLD_FILE = "row_anomaly_threshold.pkl"
+
+
+# -------- Model sets --------
+class ModelSet:
+    """
+    Sensor fault and row anomaly models used to score one partition of rows.
+
+    A species set may ship only the sensor files, only the row files, or
+    both; whatever it lacks is taken from `fallback` (the global set).
+    An optional `row_anomaly_threshold.pkl` calibrates the threshold for
+    that set's own row score scale; without one, its row model's own
+    decision is used. The global (configurable) threshold only applies to
+    rows scored by the global row model.
+    """
+
+    def __init__(self, path: str, fallback: "ModelSet" = None):
+        self.path = path
+        self.name = os.path.basename(path) if fallback is not None else "global"
+
+        if fallback is None or self._has_files(SENSOR_FILES):
+            for attr, filename in SENSOR_FILES.items():
+                setattr(self, attr, joblib.load(os.path.join(path, filename)))
+            self.sensor_explainers = [shap.TreeExplainer(est) for est in self.sensor_model.estimators_]
+            # Single-pass evaluator over all per-sensor trees; None falls back to sensor_model.predict
+            self.sensor_evaluator = compile_multi_output_forest(self.sensor_model)
+            self.own_sensor_model = True
+        else:
+            for attr in list(SENSOR_FILES) + ["sensor_explainers", "sensor_evaluator"]:
+                setattr(self, attr, getattr(fallback, attr))
+            self.own_sensor_model = False
+
+        if fallback is None or self._has_files(ROW_FILES):
+            for attr, filename in ROW_FILES.items():
+                setattr(self, attr, joblib.load(os.path.join(path, filename)))
+            threshold_file = os.path.join(path, ROW_THRESHOLD_FILE)
+            self.row_anomaly_threshold = (
+                float(joblib.load(threshold_file)) if os.path.exists(threshold_file) else None
+            )
+            self.own_row_model = True
+        else:
+            for attr in list(ROW_FILES) + ["row_anomaly_threshold"]:
+                setattr(self, attr, getattr(fallback, attr))
+            self.own_row_model = False
+
+        # Fault flags are reported against the global targets, so a species
+        # sensor model must predict the same sensors in the same order
+        if fallback is not None and list(self.sensor_target_columns) != list(fallback.sensor_target_columns):
+            raise ValueError(f"Species '{self.name}' sensor targets differ from the global model")
+
+    def _has_files(self, files: dict) -> bool:
+        present = [os.path.exists(os.path.join(self.path, f)) for f in files.values()]
+        if any(present) and not all(present):
+            raise ValueError(f"Species '{os.path.basename(self.path)}' has an incomplete model set in {self.path}")
+        return all(present)
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "own_sensor_model": self.own_sensor_model,
+            "own_row_model": self.own_row_model,
+            "row_anomaly_threshold": self.row_anomaly_threshold,
+        }
 
-# -------- Load sensor fault detection models --------
-sensor_model = joblib.load(os.path.join(model_path, "sensor_fault_model_v2.pkl"))
-sensor_feature_columns = joblib.load(os.path.join(model_path, "sensor_feature_columns_v2.pkl"))
-sensor_target_columns = joblib.load(os.path.join(model_path, "sensor_target_columns_v2.pkl"))
-sensor_explainers = [shap.TreeExplainer(est) for est in sensor_model.estimators_]
 
-# -------- Load row anomaly detection models --------
-row_model = joblib.load(os.path.join(model_path, "row_anomaly_model.pkl"))
-row_scaler = joblib.load(os.path.join(model_path, "row_anomaly_scaler.pkl"))
-row_feature_columns = joblib.load(os.path.join(model_path, "row_feature_columns.pkl"))
-row_feature_medians = joblib.load(os.path.join(model_path, "row_feature_medians.pkl"))
+# -------- Load global models --------
+global_models = ModelSet(model_path)
+
+sensor_model = global_models.sensor_model
+sensor_feature_columns = global_models.sensor_feature_columns
+sensor_target_columns = global_models.sensor_target_columns
+sensor_explainers = global_models.sensor_explainers
+sensor_evaluator = global_models.sensor_evaluator
+
+row_model = global_models.row_model
+row_scaler = global_models.row_scaler
+row_feature_columns = global_models.row_feature_columns
+row_feature_medians = global_models.row_feature_medians
+
+# -------- Load per-species models --------
+species_models = {}
+_species_lock = threading.Lock()
+
+
+def species_dir(algae_type: str) -> str:
+    """
+    Returns the species directory for `algae_type`.
+
+    Raises:
+        ValueError: If `algae_type` is not a single plain path component
+    """
+    if (not algae_type or algae_type in (".", "..") or "\0" in algae_type
+            or os.path.basename(algae_type) != algae_type
+            or (os.altsep and os.altsep in algae_type)):
+        raise ValueError(f"Invalid algae_type for a species model directory: {algae_type!r}")
+    return os.path.join(species_model_path, algae_type)
+
+
+def load_species_models(algae_type: str, before_swap=None):
+    """
+    Loads (or hot-swaps) the sub-models for one algae_type from disk.
+
+    The new set is built before it replaces the old one, so requests keep
+    being served by the previous set while loading. If the species directory
+    is gone, the species is unloaded and routed to the global models.
+
+    Args:
+        algae_type: Species directory name under species/
+        before_swap: Optional callable run on the new ModelSet before it is
+            routed to, e.g. to warm it up
+
+    Returns:
+        The loaded ModelSet, or None if the species was unloaded
+    """
+    path = species_dir(algae_type)
+    if not os.path.isdir(path):
+        with _species_lock:
+            species_models.pop(algae_type, None)
+        return None
+    models = ModelSet(path, fallback=global_models)
+    if before_swap is not None:
+        before_swap(models)
+    with _species_lock:
+        species_models[algae_type] = models
+    return models
+
+
+if os.path.isdir(species_model_path):
+    for _algae_type in sorted(os.listdir(species_model_path)):
+        if not os.path.isdir(os.path.join(species_model_path, _algae_type)):
+            continue
+        try:
+            load_species_models(_algae_type)
+        except Exception:
+            # A broken species set must not keep the API from starting
+            logger.exception("Could not load species models for '%s'; routing it to the global models", _algae_type)
+
+
+def get_models(algae_type) -> ModelSet:
+    """Routes an algae_type to its species models, falling back to the global set."""
+    return species_models.get(algae_type, global_models)
+
+
+def uses_global_threshold(models: ModelSet) -> bool:
+    """Whether rows scored by `models` are judged against the global anomaly threshold."""
+    return models is global_models or not models.own_row_model
 
 # -------- SHAP helper --------
 def _extract_shap_row(values, n_feat):
@@ -47,15 +200,74 @@ def _extract_shap_row(values, n_feat):
             return values[1, 0, :]
     raise ValueError(f"Unsupported SHAP shape: {values.shape}")
 
+# -------- Sensor fault evaluation --------
+def _build_frame(rows, feature_columns):
+    df = pd.DataFrame(rows)
+    df = pd.get_dummies(df)
+    for col in feature_columns:
+        if col not in df:
+            df[col] = -999
+    return df[feature_columns]
+
+
+def _build_sensor_frame(rows, models: ModelSet = None):
+    models = models or global_models
+    return _build_frame(rows, models.sensor_feature_columns)
+
+
+def _predict_partition_faults(rows, models: ModelSet):
+    sensor_df = _build_sensor_frame(rows, models)
+    missing = np.array([
+        [sensor in row and pd.isna(row[sensor]) for sensor in models.sensor_target_columns]
+        for row in rows
+    ], dtype=bool).reshape(len(rows), len(models.sensor_target_columns))
+
+    # The fused pass wins on small batches; past the cutoff sklearn's own
+    # per-estimator loop is faster (see scripts/benchmark_fused.py)
+    if models.sensor_evaluator is not None and len(rows) <= settings.FUSED_SENSOR_MAX_BATCH:
+        faults = models.sensor_evaluator.fault_mask(sensor_df.to_numpy(dtype=np.float32), missing)
+    else:
+        faults = (np.asarray(models.sensor_model.predict(sensor_df)) == 1) | missing
+    return sensor_df, faults
+
+
+def predict_sensor_faults(rows):
+    """
+    Predicts every sensor's fault flag for a batch of readings.
+
+    Rows are partitioned by the model set their algae_type routes to and each
+    partition is scored in one pass by that set. A sensor whose own reading is
+    present but missing (None/NaN) is always flagged as faulty.
+
+    Args:
+        rows: List of dictionaries containing sensor readings
+
+    Returns:
+        Boolean array of shape (len(rows), len(sensor_target_columns))
+    """
+    partitions = {}
+    for i, row in enumerate(rows):
+        models = get_models(row.get("algae_type"))
+        partitions.setdefault(id(models), (models, []))[1].append(i)
+
+    faults = np.zeros((len(rows), len(sensor_target_columns)), dtype=bool)
+    for models, idx in partitions.values():
+        _, faults[idx] = _predict_partition_faults([rows[i] for i in idx], models)
+    return faults
+
 # -------- Combined system prediction --------
-def predict_system_status(input_json: dict, top_n: int = 3, anomaly_threshold: float = None):
+def predict_system_status(input_json: dict, top_n: int = 3, anomaly_threshold: float = None,
+                          models: ModelSet = None):
     """
     Runs both the sensor fault model and the row anomaly model.
 
     Args:
         input_json: Dictionary containing sensor readings
         top_n: Number of top features to return in explanations
-        anomaly_threshold: Custom threshold for anomaly detection (if None, uses model default)
+        anomaly_threshold: Custom threshold for anomaly detection (if None, uses model default).
+            Ignored for a species with its own row model, which uses its calibrated
+            threshold, or its row model's default if it ships none.
+        models: Model set to use instead of routing by algae_type
 
     Returns:
         dict with keys:
@@ -64,33 +276,28 @@ def predict_system_status(input_json: dict, top_n: int = 3, anomaly_threshold: f
             - row_anomaly
             - row_score
             - row_top_features
+            - anomaly_threshold (the threshold actually applied; None for the model default)
     """
-    ### ========== Sensor-Wise Fault Detection ==========
-    sensor_df = pd.DataFrame([input_json])
-    sensor_df = pd.get_dummies(sensor_df)
-    for col in sensor_feature_columns:
-        if col not in sensor_df:
-            sensor_df[col] = -999
-    sensor_df = sensor_df[sensor_feature_columns]
-
-    pred = sensor_model.predict(sensor_df)
-    pred_df = pd.DataFrame(pred, columns=sensor_target_columns)
+    models = models or get_models(input_json.get("algae_type"))
+    # Species row models score on their own scale, so the global threshold
+    # never applies to them
+    if not uses_global_threshold(models):
+        anomaly_threshold = models.row_anomaly_threshold
 
-    # Fallback for missing input values
-    for sensor in sensor_target_columns:
-        if sensor in input_json and pd.isna(input_json[sensor]):
-            pred_df.loc[0, sensor] = 1
-
-    faulty_sensors = pred_df.columns[pred_df.iloc[0] == 1].tolist()
+    ### ========== Sensor-Wise Fault Detection ==========
+    sensor_df, faults = _predict_partition_faults([input_json], models)
+    faulty_sensors = [
+        sensor for sensor, faulty in zip(models.sensor_target_columns, faults[0]) if faulty
+    ]
 
     # SHAP-based explanation
     sensor_explanations = {}
-    for i, sensor in enumerate(sensor_target_columns):
+    for i, sensor in enumerate(models.sensor_target_columns):
         if sensor in faulty_sensors:
-            raw_shap = sensor_explainers[i].shap_values(sensor_df)
-            shap_row = _extract_shap_row(raw_shap, len(sensor_feature_columns))
+            raw_shap = models.sensor_explainers[i].shap_values(sensor_df)
+            shap_row = _extract_shap_row(raw_shap, len(models.sensor_feature_columns))
             top_feats = (
-                pd.Series(shap_row, index=sensor_feature_columns)
+                pd.Series(shap_row, index=models.sensor_feature_columns)
                 .abs()
                 .sort_values(ascending=False)
                 .head(top_n)
@@ -99,15 +306,10 @@ def predict_system_status(input_json: dict, top_n: int = 3, anomaly_threshold: f
             sensor_explanations[sensor] = top_feats
 
     ### ========== Row-Level Anomaly Detection ==========
-    row_df = pd.DataFrame([input_json])
-    row_df = pd.get_dummies(row_df)
-    for col in row_feature_columns:
-        if col not in row_df:
-            row_df[col] = -999
-    row_df = row_df[row_feature_columns]
-
-    X_scaled = row_scaler.transform(row_df)
-    base_score = float(row_model.decision_function(X_scaled)[0])
+    row_df = _build_frame([input_json], models.row_feature_columns)
+
+    X_scaled = models.row_scaler.transform(row_df)
+    base_score = float(models.row_model.decision_function(X_scaled)[0])
     
     # If any sensor fault is detected, force row anomaly and set score to 0
     if faulty_sensors:
@@ -119,15 +321,15 @@ def predict_system_status(input_json: dict, top_n: int = 3, anomaly_threshold: f
             # Invert the logic: values below threshold are anomalies
             anomaly_flag = int(base_score < anomaly_threshold)
         else:
-            anomaly_flag = int(row_model.predict(X_scaled)[0])
+            anomaly_flag = int(models.row_model.predict(X_scaled)[0])
 
     influences = {}
     row_orig = row_df.iloc[0].copy()
-    for feat in row_feature_columns:
+    for feat in models.row_feature_columns:
         row_mod = row_orig.copy()
-        row_mod[feat] = row_feature_medians.get(feat, row_mod[feat])
-        mod_scaled = row_scaler.transform([row_mod])
-        new_score = float(row_model.decision_function(mod_scaled)[0])
+        row_mod[feat] = models.row_feature_medians.get(feat, row_mod[feat])
+        mod_scaled = models.row_scaler.transform([row_mod])
+        new_score = float(models.row_model.decision_function(mod_scaled)[0])
         influences[feat] = abs(base_score - new_score)
 
     top_row_features = dict(
@@ -140,5 +342,6 @@ def predict_system_status(input_json: dict, top_n: int = 3, anomaly_threshold: f
         "sensor_explanations": sensor_explanations,
         "row_anomaly": anomaly_flag,
         "row_score": base_score,
-        "row_top_features": top_row_features
+        "row_top_features": top_row_features,
+        "anomaly_threshold": anomaly_threshold
     } 
\ No newline at end of file
@@ -0,0 +1,152 @@
+import threading
+import time
+
+import numpy as np
+
+from app.ml.models import (
+    ModelSet,
+    _build_sensor_frame,
+    get_models,
+    predict_sensor_faults,
+    predict_system_status,
+    row_feature_medians,
+    species_models,
+)
+
+# -------- Readiness state --------
+readiness = {
+    "ready": False,
+    "status": "pending",
+    "warm_latency_ms": None,
+    "latency_budget_ms": None,
+    "rounds": 0,
+    "attempts": 0,
+    "retry_in_s": None,
+    "live": True,
+    "error": None,
+}
+_lock = threading.Lock()
+
+
+def _set_readiness(**kwargs):
+    with _lock:
+        readiness.update(kwargs)
+
+
+def get_readiness() -> dict:
+    with _lock:
+        return dict(readiness)
+
+
+# -------- Synthetic warm-up inputs --------
+def _synthetic_inputs():
+    """One median reading per algae_type seen in training or with species models."""
+    base = {
+        feat: float(med) for feat, med in row_feature_medians.items()
+        if not feat.startswith("algae_type_")
+    }
+    algae_types = [
+        feat[len("algae_type_"):] for feat in row_feature_medians
+        if feat.startswith("algae_type_")
+    ]
+    algae_types += [name for name in sorted(species_models) if name not in algae_types]
+    return [dict(base, algae_type=algae_type) for algae_type in algae_types or ["Chlorella"]]
+
+
+def _warm_sensor_explainers(sample: dict, models: ModelSet = None):
+    """predict_system_status only explains faulty sensors, so hit every explainer here."""
+    models = models or get_models(sample["algae_type"])
+    sensor_df = _build_sensor_frame([sample], models)
+    for explainer in models.sensor_explainers:
+        explainer.shap_values(sensor_df)
+
+
+def warm_model_set(models: ModelSet, runs: int = 2):
+    """
+    Warms a species ModelSet before it is routed to, so a hot-swapped set
+    never serves its first request cold.
+    """
+    sample = {
+        feat: float(med) for feat, med in models.row_feature_medians.items()
+        if not feat.startswith("algae_type_")
+    }
+    sample["algae_type"] = models.name
+    _warm_sensor_explainers(sample, models)
+    for _ in range(runs):
+        predict_system_status(sample, models=models)
+
+
+# -------- Warm-up self-check --------
+def run_warmup(runs: int = 5, latency_budget_ms: float = 500.0, max_rounds: int = 3):
+    """
+    Runs synthetic predictions through every stage and marks the worker ready
+    once the median warm latency falls below `latency_budget_ms`.
+
+    The first prediction of each round is treated as cold and excluded from
+    the measurement. If the budget is still missed after `max_rounds` rounds
+    the worker stays not-ready.
+
+    Returns:
+        True if the worker is ready
+    """
+    _set_readiness(status="warming", latency_budget_ms=latency_budget_ms, error=None)
+    try:
+        samples = _synthetic_inputs()
+        for sample in samples:
+            _warm_sensor_explainers(sample)
+        predict_sensor_faults(samples)
+
+        for round_no in range(1, max_rounds + 1):
+            latencies = []
+            for run in range(runs + 1):
+                sample = samples[run % len(samples)]
+                start = time.perf_counter()
+                predict_system_status(sample)
+                elapsed_ms = (time.perf_counter() - start) * 1000.0
+                if run > 0:
+                    latencies.append(elapsed_ms)
+
+            warm_latency_ms = float(np.median(latencies)) if latencies else elapsed_ms
+            _set_readiness(warm_latency_ms=warm_latency_ms, rounds=round_no)
+            if warm_latency_ms <= latency_budget_ms:
+                _set_readiness(ready=True, status="ready", live=True, retry_in_s=None)
+                return True
+
+        _set_readiness(ready=False, status="over_budget")
+    except Exception as e:
+        _set_readiness(ready=False, status="failed", error=str(e))
+    return False
+
+
+def _warmup_with_retry(runs, latency_budget_ms, max_rounds, max_attempts,
+                       backoff_s, max_backoff_s):
+    delay = backoff_s
+    for attempt in range(1, max_attempts + 1):
+        _set_readiness(attempts=attempt, retry_in_s=None)
+        if run_warmup(runs, latency_budget_ms, max_rounds):
+            return True
+        if attempt < max_attempts:
+            _set_readiness(retry_in_s=delay)
+            time.sleep(delay)
+            delay = min(delay * 2, max_backoff_s)
+    # Give up and fail liveness so the orchestrator restarts the worker
+    _set_readiness(live=False)
+    return False
+
+
+def start_warmup(runs: int = 5, latency_budget_ms: float = 500.0, max_rounds: int = 3,
+                 max_attempts: int = 5, backoff_s: float = 5.0, max_backoff_s: float = 60.0):
+    """
+    Runs the warm-up in a background thread so liveness answers meanwhile.
+
+    A failed or over-budget attempt is retried with exponential backoff; after
+    `max_attempts` the worker reports itself not live.
+    """
+    thread = threading.Thread(
+        target=_warmup_with_retry,
+        args=(runs, latency_budget_ms, max_rounds, max_attempts, backoff_s, max_backoff_s),
+        name="model-warmup",
+        daemon=True,
+    )
+    thread.start()
+    return thread
@@ -1,6 +1,10 @@
 from typing import Dict, List, Optional, Union, Any
 from pydantic import BaseModel, Field, validator
 
+# Byte sizes of the text fields in the prediction log records
+ALGAE_TYPE_MAX_BYTES = 64
+DEVICE_ID_MAX_BYTES = 32
+
 
 class SystemStatusInput(BaseModel):
     algae_type: str = Field(..., description="Type of algae being monitored")
@@ -22,6 +26,7 @@ class SystemStatusInput(BaseModel):
     nitrate_mg_per_L: float = Field(..., description="Nitrate level in mg/L")
     phosphate_mg_per_L: float = Field(..., description="Phosphate level in mg/L")
     ammonium_mg_per_L: float = Field(..., description="Ammonium level in mg/L")
+    device_id: Optional[str] = Field(None, description="Identifier of the reporting device")
 
     class Config:
         allow_population_by_field_name = True
@@ -49,6 +54,18 @@ class SystemStatusInput(BaseModel):
             }
         }
 
+    @validator("algae_type")
+    def algae_type_fits_log(cls, v):
+        if len(v.encode()) > ALGAE_TYPE_MAX_BYTES:
+            raise ValueError(f"algae_type must be at most {ALGAE_TYPE_MAX_BYTES} bytes of UTF-8")
+        return v
+
+    @validator("device_id")
+    def device_id_fits_log(cls, v):
+        if v is not None and len(v.encode()) > DEVICE_ID_MAX_BYTES:
+            raise ValueError(f"device_id must be at most {DEVICE_ID_MAX_BYTES} bytes of UTF-8")
+        return v
+
     def dict(self, *args, **kwargs):
         # Make sure we handle the humidity field correctly
         result = super().dict(*args, **kwargs)
@@ -62,4 +79,5 @@ class SystemStatusResponse(BaseModel):
     sensor_explanations: Dict[str, Dict[str, float]] = Field(..., description="Explanations for each sensor fault")
     row_anomaly: bool = Field(..., description="Whether row-level anomaly was detected")
     row_score: float = Field(..., description="Anomaly score for the row")
-    row_top_features: Dict[str, float] = Field(..., description="Top features contributing to row anomaly") 
\ No newline at end of file
+    row_top_features: Dict[str, float] = Field(..., description="Top features contributing to row anomaly")
+    anomaly_threshold: Optional[float] = Field(None, description="Row anomaly threshold applied (None for the model default)") 
\ No newline at end of file
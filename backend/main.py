@@ -1,9 +1,30 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.routes import router as api_router
+from app.api.routes import prediction_log, restore_state, router as api_router
 from app.core.config import settings
+from app.ml.warmup import start_warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    restore_state()
+    # Warm models in the background; /ready stays 503 until this finishes
+    start_warmup(
+        runs=settings.WARMUP_RUNS,
+        latency_budget_ms=settings.READINESS_LATENCY_BUDGET_MS,
+        max_rounds=settings.WARMUP_MAX_ROUNDS,
+        max_attempts=settings.WARMUP_MAX_ATTEMPTS,
+        backoff_s=settings.WARMUP_RETRY_BACKOFF_S,
+        max_backoff_s=settings.WARMUP_RETRY_MAX_BACKOFF_S,
+    )
+    yield
+    if prediction_log is not None:
+        prediction_log.flush()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -12,6 +33,7 @@ app = FastAPI(
     openapi_url=f"{settings.API_PREFIX}/openapi.json",
     docs_url=f"{settings.API_PREFIX}/docs",
     redoc_url=f"{settings.API_PREFIX}/redoc",
+    lifespan=lifespan,
 )
 
 # Set up CORS middleware
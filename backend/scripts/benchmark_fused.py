@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Script to compare the fused sensor evaluator against sensor_model.predict
+across batch sizes, to pick FUSED_SENSOR_MAX_BATCH for the deployed model.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ml.models import sensor_evaluator, sensor_feature_columns, sensor_model, row_feature_medians
+
+
+def _best_of(fn, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def benchmark(batch_sizes=(1, 16, 64, 128, 256, 512)):
+    if sensor_evaluator is None:
+        print("Sensor model cannot be fused; sensor_model.predict is always used.")
+        return 1
+
+    rng = np.random.default_rng(0)
+    base = np.array([row_feature_medians.get(col, 0.0) for col in sensor_feature_columns])
+    X = (base * rng.normal(1.0, 0.2, size=(max(batch_sizes), len(base)))).astype(np.float32)
+
+    print(f"{'rows':>6} {'fused ms':>10} {'sklearn ms':>11} {'equal':>6}")
+    for n in batch_sizes:
+        batch = X[:n]
+        equal = bool((sensor_evaluator.predict(batch) == sensor_model.predict(batch)).all())
+        fused_ms = _best_of(lambda: sensor_evaluator.predict(batch))
+        sklearn_ms = _best_of(lambda: sensor_model.predict(batch))
+        print(f"{n:>6} {fused_ms:>10.1f} {sklearn_ms:>11.1f} {str(equal):>6}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(benchmark())
@@ -8,6 +8,19 @@ from main import app
 
 client = TestClient(app)
 
+
+@pytest.fixture(autouse=True)
+def isolated_prediction_log(tmp_path, monkeypatch):
+    """Keep API tests from appending to the real prediction log."""
+    from app.api import routes
+    from app.core.prediction_log import PredictionLog
+
+    log = PredictionLog(str(tmp_path / "prediction_log"), routes.prediction_log.feature_columns,
+                        routes.prediction_log.target_columns, flush_interval=0.0)
+    monkeypatch.setattr(routes, "prediction_log", log)
+    yield log
+    log.flush()
+
 def test_health_endpoint():
     """Test that the health endpoint returns a 200 status code."""
     response = client.get("/api/v1/health")
@@ -52,4 +65,246 @@ def test_prediction_endpoint():
     assert isinstance(data["sensor_faults"], list)
     assert isinstance(data["row_anomaly"], bool)
     assert isinstance(data["row_score"], float)
-    assert isinstance(data["row_top_features"], dict) 
\ No newline at end of file
+    assert isinstance(data["row_top_features"], dict) 
+
+def test_drift_endpoint():
+    """Test that the drift endpoint reports scores per algae type."""
+    response = client.get("/api/v1/drift")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert "threshold" in data
+    assert isinstance(data["algae_types"], dict)
+
+
+def test_ready_endpoint_after_warmup():
+    """Test that readiness flips to 200 once warm-up meets the latency budget."""
+    from app.ml.warmup import run_warmup
+
+    run_warmup(runs=1, latency_budget_ms=60000.0, max_rounds=1)
+    response = client.get("/api/v1/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+
+
+def _sample(**overrides):
+    sample = {
+        'algae_type': 'Chlorella', 'temperature_C': 28.0, 'humidity_%': 65.0, 'pH': 7.2,
+        'light_intensity_umol_m2_s': 1200.0, 'light_intensity_lux': 18000.0,
+        'water_level_cm': 48.0, 'dissolved_oxygen_mg_per_L': 8.0, 'conductivity_uS_cm': 600.0,
+        'turbidity_NTU': 2.5, 'chlorophyll_a_ug_per_L': 38.0, 'CO2_flow_rate_mL_per_min': 95.0,
+        'aeration_rate_L_per_min': 2.1, 'optical_density_680nm': 0.9,
+        'photosynthetic_efficiency_pct': 28.0, 'biomass_concentration_g_per_L': 4.0,
+        'nitrate_mg_per_L': 4.5, 'phosphate_mg_per_L': 0.9, 'ammonium_mg_per_L': 1.0
+    }
+    sample.update(overrides)
+    return sample
+
+
+def test_species_models_are_routed_and_hot_swapped(tmp_path, monkeypatch):
+    """Test that a species model set is warmed, routed to and unloaded on reload."""
+    import shutil
+    import joblib
+    from app.api import routes
+    from app.ml import models
+
+    monkeypatch.setattr(models, "species_model_path", str(tmp_path))
+    monkeypatch.setattr(routes, "current_anomaly_threshold", routes.current_anomaly_threshold)
+    species_dir = tmp_path / "Spirulina"
+    species_dir.mkdir()
+    for filename in models.ROW_FILES.values():
+        shutil.copy(os.path.join(models.model_path, filename), species_dir / filename)
+    species_medians = dict(models.row_feature_medians, pH=9.5)
+    joblib.dump(species_medians, species_dir / "row_feature_medians.pkl")
+    # Every score is below this threshold, so every fault-free row is anomalous
+    joblib.dump(10.0, species_dir / models.ROW_THRESHOLD_FILE)
+
+    warmed = []
+    real_warm = routes.warm_model_set
+
+    def warm(model_set):
+        # The new set must not take traffic until it is warm
+        assert models.get_models("Spirulina") is not model_set
+        real_warm(model_set)
+        warmed.append(model_set.name)
+
+    monkeypatch.setattr(routes, "warm_model_set", warm)
+    response = client.post("/api/v1/models/Spirulina/reload")
+    assert response.status_code == 200
+    assert warmed == ["Spirulina"]
+    assert response.json()["models"] == {
+        "name": "Spirulina",
+        "own_sensor_model": False,
+        "own_row_model": True,
+        "row_anomaly_threshold": 10.0
+    }
+    assert "Spirulina" in client.get("/api/v1/models").json()["species"]
+    assert routes.drift_monitor.medians_for("Spirulina")["pH"] == 9.5
+
+    spirulina = models.get_models("Spirulina")
+    assert spirulina.sensor_model is models.global_models.sensor_model
+    assert models.get_models("Chlorella") is models.global_models
+
+    # The applied species threshold is reported, not the global one
+    data = client.post("/api/v1/predict", json=_sample(algae_type="Spirulina")).json()
+    assert data["anomaly_threshold"] == 10.0
+    # A global threshold cannot override it, and is not stored as the global one
+    response = client.post("/api/v1/predict?anomaly_threshold=0.05", json=_sample(algae_type="Spirulina"))
+    assert response.status_code == 400
+    assert routes.current_anomaly_threshold != 0.05
+    data = client.post("/api/v1/predict?anomaly_threshold=0.05", json=_sample()).json()
+    assert data["anomaly_threshold"] == 0.05
+
+    # Without a calibrated threshold the species row model decides on its own
+    os.remove(species_dir / models.ROW_THRESHOLD_FILE)
+    assert client.post("/api/v1/models/Spirulina/reload").status_code == 200
+    data = client.post("/api/v1/predict", json=_sample(algae_type="Spirulina")).json()
+    assert data["anomaly_threshold"] is None
+
+    shutil.rmtree(species_dir)
+    response = client.post("/api/v1/models/Spirulina/reload")
+    assert response.json()["loaded"] is False
+    assert models.get_models("Spirulina") is models.global_models
+    assert routes.drift_monitor.medians_for("Spirulina") is routes.drift_monitor.training_medians
+
+
+def test_reload_rejects_species_names_outside_species_dir():
+    """Test that reload only accepts a single plain directory name."""
+    from app.ml import models
+
+    for name in ["%2E%2E", "%2E", "a%2Fb", "..%2F..%2Fetc"]:
+        response = client.post(f"/api/v1/models/{name}/reload")
+        assert response.status_code in (400, 404)
+    assert client.post("/api/v1/models/%2E%2E/reload").status_code == 400
+    assert ".." not in models.species_models
+
+
+def test_broken_species_set_does_not_stop_startup(tmp_path, monkeypatch, caplog):
+    """Test that an unloadable species directory is logged and skipped at import."""
+    import importlib
+    from app.ml import models
+
+    (tmp_path / "species" / "Broken").mkdir(parents=True)
+    # Only one of the sensor files makes an incomplete (ValueError) set
+    with open(tmp_path / "species" / "Broken" / models.SENSOR_FILES["sensor_model"], "wb"):
+        pass
+    for filename in list(models.SENSOR_FILES.values()) + list(models.ROW_FILES.values()):
+        os.symlink(os.path.join(models.model_path, filename), tmp_path / filename)
+
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "MODEL_PATH", str(tmp_path))
+    spec = importlib.util.spec_from_file_location("_models_reimport", models.__file__)
+    module = importlib.util.module_from_spec(spec)
+    with caplog.at_level("ERROR"):
+        spec.loader.exec_module(module)
+    assert "Broken" not in module.species_models
+    assert module.get_models("Broken") is module.global_models
+    assert "Broken" in caplog.text
+
+
+def test_batch_routes_mixed_species_to_their_models(tmp_path, monkeypatch):
+    """Test that a mixed batch is partitioned per model set, even for a species named 'global'."""
+    import joblib
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.multioutput import MultiOutputClassifier
+    from app.ml import models
+
+    features = [col for col in models.sensor_feature_columns if not col.startswith("algae_type_")]
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, len(features))) * 10 + 20
+    Y = (X[:, :len(models.sensor_target_columns)] > 20).astype(int)
+    species_model = MultiOutputClassifier(
+        RandomForestClassifier(n_estimators=3, max_depth=3, random_state=0)
+    ).fit(X, Y)
+
+    species_dir = tmp_path / "global"
+    species_dir.mkdir()
+    joblib.dump(species_model, species_dir / models.SENSOR_FILES["sensor_model"])
+    joblib.dump(features, species_dir / models.SENSOR_FILES["sensor_feature_columns"])
+    joblib.dump(models.sensor_target_columns, species_dir / models.SENSOR_FILES["sensor_target_columns"])
+    monkeypatch.setattr(models, "species_model_path", str(tmp_path))
+    monkeypatch.setitem(models.species_models, "global", models.ModelSet(str(species_dir), models.global_models))
+
+    rows = [
+        {feat: float(v) for feat, v in zip(features, x)} | {"algae_type": algae_type}
+        for x, algae_type in zip(X[:20], ["global", "Chlorella"] * 10)
+    ]
+    faults = models.predict_sensor_faults(rows)
+
+    species_rows = [r for r in rows if r["algae_type"] == "global"]
+    expected = species_model.predict(models._build_sensor_frame(species_rows, models.species_models["global"])) == 1
+    np.testing.assert_array_equal(faults[0::2], expected)
+
+    global_rows = [r for r in rows if r["algae_type"] == "Chlorella"]
+    expected = models.sensor_model.predict(models._build_sensor_frame(global_rows)) == 1
+    np.testing.assert_array_equal(faults[1::2], expected)
+
+
+def test_warmup_gives_up_and_fails_liveness():
+    """Test that an over-budget warm-up retries, then stays not-ready and fails liveness."""
+    from app.ml.warmup import _warmup_with_retry, get_readiness, run_warmup
+
+    assert not _warmup_with_retry(1, 0.0, 1, max_attempts=2, backoff_s=0.0, max_backoff_s=0.0)
+    assert get_readiness()["attempts"] == 2
+    response = client.get("/api/v1/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "over_budget"
+    response = client.get("/api/v1/health")
+    assert response.status_code == 503
+    assert response.json()["status"] == "unhealthy"
+
+    # A later successful warm-up restores both probes
+    assert run_warmup(runs=1, latency_budget_ms=60000.0, max_rounds=1)
+    assert client.get("/api/v1/health").status_code == 200
+    assert client.get("/api/v1/ready").status_code == 200
+
+
+def test_text_fields_limited_by_utf8_bytes():
+    """Test that device_id and algae_type are limited by their encoded size in the log."""
+    response = client.post("/api/v1/predict", json=_sample(device_id='€' * 11))
+    assert response.status_code == 422
+    response = client.post("/api/v1/predict", json=_sample(algae_type='x' * 65))
+    assert response.status_code == 422
+
+
+def test_restore_skips_unreadable_records(tmp_path, monkeypatch):
+    """Test that a bad log record is skipped instead of aborting startup."""
+    from app.api import routes
+    from app.core.prediction_log import PredictionLog
+
+    log = PredictionLog(str(tmp_path), routes.prediction_log.feature_columns,
+                        routes.prediction_log.target_columns, flush_interval=0.0)
+    input_json = {feat: 1.0 for feat in log.feature_columns}
+    for threshold in (0.01, 0.02):
+        log.append(dict(input_json, algae_type='Chlorella'),
+                   {'sensor_faults': [], 'row_score': 0.1, 'row_anomaly': 0}, threshold)
+    log.flush()
+
+    real_to_dict = log.to_dict
+
+    def to_dict(rec):
+        if float(rec['anomaly_threshold']) == 0.02:
+            raise UnicodeDecodeError('utf-8', b'\xe2', 0, 1, 'truncated')
+        return real_to_dict(rec)
+
+    monkeypatch.setattr(log, 'to_dict', to_dict)
+    monkeypatch.setattr(routes, 'prediction_log', log)
+    monkeypatch.setattr(routes, 'current_anomaly_threshold', 0.08)
+    routes.restore_state()
+    assert routes.current_anomaly_threshold == 0.01
+
+
+def test_large_batches_fall_back_to_sensor_model(monkeypatch):
+    """Test that batches above FUSED_SENSOR_MAX_BATCH skip the fused evaluator."""
+    from app.core.config import settings
+    from app.ml import models
+
+    def fail(*args, **kwargs):
+        raise AssertionError("fused evaluator used above the batch cutoff")
+
+    monkeypatch.setattr(settings, "FUSED_SENSOR_MAX_BATCH", 1)
+    monkeypatch.setattr(models.global_models.sensor_evaluator, "fault_mask", fail)
+    rows = [{feat: 1.0 for feat in models.sensor_target_columns} for _ in range(2)]
+    _, faults = models._predict_partition_faults(rows, models.global_models)
+    assert faults.shape == (2, len(models.sensor_target_columns))
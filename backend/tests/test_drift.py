@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ml.drift import DriftMonitor
+
+MEDIANS = {
+    'temperature_C': 27.5,
+    'pH': 7.75,
+    'algae_type_Chlorella': 0.0,
+    'algae_type_Spirulina': 1.0
+}
+
+
+def test_one_hot_columns_are_not_monitored():
+    """Test that algae_type dummy columns are excluded from monitoring."""
+    monitor = DriftMonitor(MEDIANS)
+    assert set(monitor.training_medians) == {'temperature_C', 'pH'}
+
+
+def test_scores_withheld_until_min_samples():
+    """Test that features are not scored before enough readings arrive."""
+    monitor = DriftMonitor(MEDIANS, min_samples=5)
+    for _ in range(4):
+        monitor.update({'algae_type': 'Chlorella', 'temperature_C': 27.5, 'pH': 7.7})
+
+    features = monitor.report()['Chlorella']['features']
+    assert features['temperature_C']['count'] == 4
+    assert features['temperature_C']['drift_score'] is None
+
+
+def test_drift_detected_per_algae_type():
+    """Test that a shifted feature is flagged only for the drifting algae type."""
+    monitor = DriftMonitor(MEDIANS, half_life=50, min_samples=10)
+    for i in range(200):
+        jitter = 0.1 if i % 2 else -0.1
+        monitor.update({'algae_type': 'Chlorella', 'temperature_C': 27.5 + jitter, 'pH': 7.75})
+        monitor.update({'algae_type': 'Spirulina', 'temperature_C': 35.0 + jitter, 'pH': 7.75})
+
+    report = monitor.report()
+    assert report['Chlorella']['drifted_features'] == []
+    assert report['Spirulina']['drifted_features'] == ['temperature_C']
+
+
+def test_missing_values_are_skipped():
+    """Test that None and NaN readings do not update the sketch."""
+    monitor = DriftMonitor(MEDIANS)
+    monitor.update({'algae_type': 'Chlorella', 'temperature_C': None, 'pH': float('nan')})
+    assert monitor.report()['Chlorella']['features'] == {}
+
+
+def test_stationary_data_not_flagged_at_min_samples():
+    """Test that undrifted readings are not flagged as soon as scoring starts."""
+    import random
+
+    flagged = 0
+    for trial in range(200):
+        rng = random.Random(trial)
+        monitor = DriftMonitor(MEDIANS, half_life=500, min_samples=30)
+        for _ in range(30):
+            monitor.update({'algae_type': 'Chlorella', 'pH': rng.gauss(7.75, 0.3)})
+        assert monitor.report()['Chlorella']['features']['pH']['count'] == 30
+        flagged += bool(monitor.report()['Chlorella']['drifted_features'])
+    assert flagged == 0
+
+
+def test_unknown_algae_types_share_overflow_bucket():
+    """Test that free-form algae_type values cannot grow memory without bound."""
+    monitor = DriftMonitor(MEDIANS, max_types=2)
+    for i in range(50):
+        monitor.update({'algae_type': f'type-{i}', 'pH': 7.7})
+
+    report = monitor.report()
+    assert set(report) == {'type-0', 'type-1', DriftMonitor.OVERFLOW_TYPE}
+    assert report[DriftMonitor.OVERFLOW_TYPE]['features']['pH']['count'] == 48
@@ -0,0 +1,76 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.multioutput import MultiOutputClassifier
+
+from app.ml.fused import compile_multi_output_forest
+
+
+def _training_data(n_rows=400, n_features=8, n_targets=5, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features)) * 100
+    Y = (X[:, :n_targets] + rng.normal(size=(n_rows, n_targets)) * 50 > 60).astype(int)
+    Y[:, -1] = 0  # a sensor that never faulted in training has a single class
+    return X, Y
+
+
+def test_matches_random_forest_predict():
+    """Test that the fused evaluator reproduces MultiOutputClassifier.predict exactly."""
+    X, Y = _training_data()
+    model = MultiOutputClassifier(
+        RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0)
+    ).fit(X, Y)
+    evaluator = compile_multi_output_forest(model)
+    assert evaluator is not None
+
+    X_test, _ = _training_data(n_rows=300, seed=1)
+    X_test[::7, 2] = -999
+    np.testing.assert_array_equal(evaluator.predict(X_test), model.predict(X_test))
+
+
+def test_matches_extra_trees_with_missing_values():
+    """Test that NaN inputs follow each node's learned missing-value direction."""
+    X, Y = _training_data(seed=2)
+    X[::5, 1] = np.nan
+    model = MultiOutputClassifier(
+        ExtraTreesClassifier(n_estimators=10, random_state=0)
+    ).fit(X, Y)
+    evaluator = compile_multi_output_forest(model)
+
+    X_test, _ = _training_data(n_rows=200, seed=3)
+    X_test[::3, 1] = np.nan
+    np.testing.assert_array_equal(evaluator.predict(X_test), model.predict(X_test))
+
+
+def test_missing_mask_forces_faults():
+    """Test that the missing-input mask overrides predictions on the batch."""
+    X, Y = _training_data()
+    model = MultiOutputClassifier(RandomForestClassifier(n_estimators=5, random_state=0)).fit(X, Y)
+    evaluator = compile_multi_output_forest(model)
+
+    missing = np.zeros((len(X), Y.shape[1]), dtype=bool)
+    missing[0, -1] = True
+    faults = evaluator.fault_mask(X, missing)
+    assert faults[0, -1]
+    np.testing.assert_array_equal(faults[1:], model.predict(X)[1:] == 1)
+
+
+def test_unsupported_model_is_not_compiled():
+    """Test that models without tree estimators fall back to None."""
+    assert compile_multi_output_forest(object()) is None
+
+
+def test_matches_deep_forest_on_large_batch():
+    """Test that compacted traversal of fully grown trees stays exact on a batch."""
+    X, Y = _training_data(n_rows=1500, seed=4)
+    model = MultiOutputClassifier(
+        RandomForestClassifier(n_estimators=20, random_state=0)
+    ).fit(X, Y)
+    evaluator = compile_multi_output_forest(model)
+    assert evaluator.max_depth > 15
+
+    X_test, _ = _training_data(n_rows=512, seed=5)
+    np.testing.assert_array_equal(evaluator.predict(X_test), model.predict(X_test))
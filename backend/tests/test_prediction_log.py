@@ -0,0 +1,159 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.core.prediction_log import PredictionLog, _from_ns
+
+FEATURES = ['temperature_C', 'humidity_%', 'pH']
+TARGETS = ['temperature_C', 'humidity_%', 'pH']
+
+
+def _results(faults, score=0.05, anomaly=0):
+    return {'sensor_faults': faults, 'row_score': score, 'row_anomaly': anomaly}
+
+
+def _make_log(tmp_path):
+    return PredictionLog(str(tmp_path), FEATURES, TARGETS, flush_interval=0.0)
+
+
+def test_round_trip(tmp_path):
+    """Test that appended predictions are committed and decoded back."""
+    log = _make_log(tmp_path)
+    log.append({'algae_type': 'Chlorella', 'temperature_C': 28.0, 'pH': 7.2},
+               _results(['pH'], score=0.0, anomaly=1), 0.08, 'tank-1')
+    log.append({'algae_type': 'Spirulina', 'temperature_C': 30.0, 'humidity_%': 60.0, 'pH': 9.0},
+               _results([]), 0.08, 'tank-2')
+    log.flush()
+
+    records = log.to_dicts(log.tail(10))
+    assert [r['device_id'] for r in records] == ['tank-1', 'tank-2']
+    assert records[0]['sensor_faults'] == ['pH']
+    assert records[0]['row_anomaly'] is True
+    assert records[0]['input_data']['humidity_%'] is None
+    assert records[1]['input_data']['algae_type'] == 'Spirulina'
+    assert records[1]['anomaly_threshold'] == 0.08
+
+
+def test_query_by_time_range_and_device(tmp_path):
+    """Test that range queries slice the mapped segment and device filters apply."""
+    log = _make_log(tmp_path)
+    for i in range(6):
+        log.append({'algae_type': 'Chlorella', 'temperature_C': float(i), 'pH': 7.0},
+                   _results([]), None, 'tank-1' if i % 2 else 'tank-2')
+    log.flush()
+
+    everything = np.concatenate(log.query())
+    assert len(everything) == 6
+    assert np.all(np.diff(everything['timestamp_ns']) >= 0)
+
+    cutoff = _from_ns(int(everything['timestamp_ns'][3]))
+    later = log.query(start=cutoff)
+    assert sum(len(p) for p in later) >= 3
+    assert isinstance(later[0], np.memmap)
+
+    tank1 = np.concatenate(log.query(device_id='tank-1'))
+    assert list(tank1['features'][:, 0]) == [1.0, 3.0, 5.0]
+
+    future = datetime.now(timezone.utc) + timedelta(days=2)
+    assert log.query(start=future) == []
+
+
+def test_torn_trailing_record_is_dropped(tmp_path):
+    """Test that a partially written record is ignored on read and truncated on open."""
+    log = _make_log(tmp_path)
+    log.append({'algae_type': 'Chlorella', 'temperature_C': 28.0, 'pH': 7.2}, _results([]))
+    log.flush()
+
+    path = log._segments()[0][1]
+    with open(path, 'ab') as f:
+        f.write(b'\x01' * (log.dtype.itemsize // 2))
+
+    assert len(log.tail(10)) == 1
+    reopened = _make_log(tmp_path)
+    assert os.path.getsize(path) == len(reopened._header) + reopened.dtype.itemsize
+    assert len(reopened.tail(10)) == 1
+
+
+def test_multibyte_text_round_trips(tmp_path):
+    """Test that text fields are cut on character boundaries and decode safely."""
+    log = _make_log(tmp_path)
+    log.append({'algae_type': 'Nannochloropsis oculata', 'pH': 7.2}, _results([]), None, '€' * 11)
+    log.append({'algae_type': 'Chlorella', 'pH': 7.2}, _results([]), None, '€' * 20)
+    log.flush()
+
+    records = log.to_dicts(log.tail(10))
+    assert records[0]['input_data']['algae_type'] == 'Nannochloropsis oculata'
+    assert records[0]['device_id'] == '€' * 10
+    assert records[1]['device_id'] == '€' * 10
+
+    # Records written with a byte-cut character still decode
+    raw = log.tail(1).copy()
+    raw['device_id'] = ('€' * 11).encode()[:32]
+    assert log.to_dict(raw[0])['device_id'].startswith('€' * 10)
+
+
+def test_writer_retries_failed_writes(tmp_path, monkeypatch):
+    """Test that a failed segment write is retried instead of dropping the batch."""
+    log = _make_log(tmp_path)
+    real_write = log._write_segment
+    calls = []
+
+    def flaky_write(day, data):
+        calls.append(day)
+        if len(calls) == 1:
+            raise OSError(28, 'No space left on device')
+        real_write(day, data)
+
+    monkeypatch.setattr(log, '_write_segment', flaky_write)
+    log.append({'algae_type': 'Chlorella', 'pH': 7.2}, _results([]))
+    log.flush()
+
+    assert len(calls) == 2
+    assert len(log.tail(10)) == 1
+
+
+def test_unencodable_record_does_not_stop_writer(tmp_path):
+    """Test that a record that cannot be encoded is dropped without losing the rest."""
+    log = _make_log(tmp_path)
+    log.append({'algae_type': 'Chlorella', 'pH': 'not a number'}, _results([]))
+    log.append({'algae_type': 'Chlorella', 'pH': 7.2}, _results([]))
+    log.flush()
+
+    records = log.to_dicts(log.tail(10))
+    assert [r['input_data']['pH'] for r in records] == [7.2]
+
+
+def test_segments_with_another_schema_are_left_untouched(tmp_path):
+    """Test that a feature-list change skips old segments instead of truncating them."""
+    log = _make_log(tmp_path)
+    log.append({'algae_type': 'Chlorella', 'pH': 7.2}, _results([]))
+    log.flush()
+    old_path = log._segments()[0][1]
+    with open(old_path, 'ab') as f:
+        f.write(b'\x01' * 5)
+    # A headerless segment from an older log format
+    legacy_path = log._segment_path('20200101')
+    with open(legacy_path, 'wb') as f:
+        f.write(b'\x00' * 100)
+    with open(old_path, 'rb') as f:
+        old_bytes = f.read()
+
+    wider = PredictionLog(str(tmp_path), FEATURES + ['light_lux'], TARGETS, flush_interval=0.0)
+    assert len(wider.tail(10)) == 0
+    wider.append({'algae_type': 'Chlorella', 'pH': 7.5, 'light_lux': 900.0}, _results([]))
+    wider.flush()
+
+    with open(old_path, 'rb') as f:
+        assert f.read() == old_bytes
+    assert os.path.getsize(legacy_path) == 100
+    new_path = wider._segments()[0][1]
+    assert new_path != old_path
+    assert wider.to_dicts(wider.tail(10))[0]['input_data']['light_lux'] == 900.0
+
+    # The original schema still reads its own segment, minus the torn tail
+    original = _make_log(tmp_path)
+    assert [r['input_data']['pH'] for r in original.to_dicts(original.tail(10))] == [7.2]